@@ -1,12 +1,11 @@
 import os
-import re
 import matplotlib
 
 matplotlib.use('Agg')  # 使用非交互式后端
 import matplotlib.pyplot as plt
-import numpy as np
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
+from matplotlib.figure import Figure
+from profile_core import (build_temperature_profile, build_workbook, draw_temperature_profile,
+                          validate_filename)
 
 # 配置中文显示
 plt.rcParams["font.family"] = ["SimHei", "Arial Unicode MS"]
@@ -27,15 +26,6 @@ def create_directories():
         return False
 
 
-def validate_filename(filename):
-    """验证并清理文件名"""
-    invalid_chars = r'[\\/*?:"<>|]'
-    cleaned = re.sub(invalid_chars, '', filename)
-    if not cleaned:
-        return "temp_profile"
-    return cleaned[:50]
-
-
 def get_user_input():
     """获取用户输入的参数（时间单位改为小时）"""
     params = {}
@@ -80,130 +70,17 @@ def get_user_input():
 def calculate_temperature_profile(params):
     """计算温度曲线数据（内部计算使用小时单位）"""
     try:
-        profile = []
-        key_points = []
-        current_time = 0.0  # 时间单位：小时
-        current_temp = params['initial_temp']
-
-        # 1. 初始温度阶段
-        profile.append((current_time, current_temp, "初始温度开始"))
-        key_points.append(len(profile) - 1)
-        current_time += params['initial_time']  # 直接累加小时
-        profile.append((current_time, current_temp, "初始温度结束"))
-        key_points.append(len(profile) - 1)
-
-        # 2. 循环过程
-        for cycle in range(params['cycles']):
-            if cycle == 0:
-                high_time = params['first_high_time']
-                low_time = params['first_low_time']
-                cycle_type = "首循环"
-            elif cycle == params['cycles'] - 1:
-                high_time = params['last_high_time']
-                low_time = params['last_low_time']
-                cycle_type = "末循环"
-            else:
-                high_time = params['middle_high_time']
-                low_time = params['middle_low_time']
-                cycle_type = f"中间循环{cycle}"
-
-            # 升温到高温（速率单位为℃/h，直接计算）
-            temp_diff = params['high_temp'] - current_temp
-            if temp_diff != 0:
-                # 时间变化 = 温差 / 速率（已转换为℃/h）
-                time_change = abs(temp_diff) / (params['heat_rate'] if temp_diff > 0 else params['cool_rate'])
-                current_time += time_change
-                profile.append((current_time, params['high_temp'], f"{cycle_type}高温达到"))
-                key_points.append(len(profile) - 1)
-                current_temp = params['high_temp']
-
-            # 高温保持（小时单位直接累加）
-            current_time += high_time
-            profile.append((current_time, current_temp, f"{cycle_type}高温结束"))
-            key_points.append(len(profile) - 1)
-
-            # 降温到低温（非最后一轮）
-            if cycle < params['cycles'] - 1:
-                temp_diff = params['low_temp'] - current_temp
-                if temp_diff != 0:
-                    time_change = abs(temp_diff) / (params['heat_rate'] if temp_diff > 0 else params['cool_rate'])
-                    current_time += time_change
-                    profile.append((current_time, params['low_temp'], f"{cycle_type}低温达到"))
-                    key_points.append(len(profile) - 1)
-                    current_temp = params['low_temp']
-
-                # 低温保持
-                current_time += low_time
-                profile.append((current_time, current_temp, f"{cycle_type}低温结束"))
-                key_points.append(len(profile) - 1)
-
-        # 3. 回温阶段
-        temp_diff = params['recovery_temp'] - current_temp
-        if temp_diff != 0:
-            time_change = abs(temp_diff) / (params['heat_rate'] if temp_diff > 0 else params['cool_rate'])
-            current_time += time_change
-            profile.append((current_time, params['recovery_temp'], "回温温度达到"))
-            key_points.append(len(profile) - 1)
-            current_temp = params['recovery_temp']
-
-        current_time += params['recovery_time']
-        profile.append((current_time, current_temp, "回温结束"))
-        key_points.append(len(profile) - 1)
-
-        return profile, key_points
+        return build_temperature_profile(params)
     except Exception as e:
         print(f"计算出错: {e}")
-        return None, None
+        return None, None, None, None
 
 
-def create_excel_file(params, profile, filename):
+def create_excel_file(params, times, temps, descs, filename):
     """创建Excel数据文件（显示小时单位）"""
     try:
-        wb = Workbook()
-        ws_params = wb.active
-        ws_params.title = "输入参数"
-
-        # 参数表（单位改为小时）
-        ws_params['A1'], ws_params['B1'], ws_params['C1'] = "参数名称", "数值", "单位"
-        for cell in ['A1', 'B1', 'C1']:
-            ws_params[cell].font = Font(bold=True)
-
-        # 注意：速率显示时转换回℃/min
-        param_list = [
-            ("初始温度", params['initial_temp'], "℃"),
-            ("初始温度持续时间", params['initial_time'], "h"),
-            ("回温温度", params['recovery_temp'], "℃"),
-            ("回温温度持续时间", params['recovery_time'], "h"),
-            ("高温温度", params['high_temp'], "℃"),
-            ("高温允差", params['high_tolerance'], "℃"),
-            ("低温温度", params['low_temp'], "℃"),
-            ("低温允差", params['low_tolerance'], "℃"),
-            ("首循环高温保持时间", params['first_high_time'], "h"),
-            ("首循环低温保持时间", params['first_low_time'], "h"),
-            ("末循环高温保持时间", params['last_high_time'], "h"),
-            ("末循环低温保持时间", params['last_low_time'], "h"),
-            ("中间循环高温保持时间", params['middle_high_time'], "h"),
-            ("中间循环低温保持时间", params['middle_low_time'], "h"),
-            ("升温速率", params['heat_rate'] / 60, "℃/min"),  # 转换回原单位显示
-            ("降温速率", params['cool_rate'] / 60, "℃/min"),  # 转换回原单位显示
-            ("循环次数", params['cycles'], "次")
-        ]
-
-        for i, (name, value, unit) in enumerate(param_list, start=2):
-            ws_params[f'A{i}'] = name
-            ws_params[f'B{i}'] = round(value, 2) if isinstance(value, float) else value
-            ws_params[f'C{i}'] = unit
-
-        # 数据表（时间单位显示为小时）
-        ws_data = wb.create_sheet(title="温度随时间变化")
-        ws_data['A1'], ws_data['B1'], ws_data['C1'] = "时间 (h)", "温度 (℃)", "说明"
-        for cell in ['A1', 'B1', 'C1']:
-            ws_data[cell].font = Font(bold=True)
-
-        for i, (time, temp, desc) in enumerate(profile, start=2):
-            ws_data[f'A{i}'] = round(time, 2)
-            ws_data[f'B{i}'] = round(temp, 2)
-            ws_data[f'C{i}'] = desc
+        # 参数表与数据表（时间显示为小时，速率显示为℃/min）
+        wb = build_workbook(params, times, temps, descs)
 
         wb.save(os.path.join('data/data', filename))
         print(f"数据文件已保存至: {os.path.join('data/data', filename)}")
@@ -213,106 +90,31 @@ def create_excel_file(params, profile, filename):
         return False
 
 
-def create_chart_png(profile, key_points, filename):
-    """生成PNG图表（显示小时单位）"""
+def create_chart_png(times, temps, key_points, filename, dpi=200):
+    """生成PNG图表（显示小时单位），dpi控制输出分辨率"""
     try:
-        times = [p[0] for p in profile]
-        temps = [p[1] for p in profile]
-        descriptions = [p[2] for p in profile]
-
         # 创建图表
-        plt.figure(figsize=(14, 9))
-
-        # 绘制温度曲线
-        plt.plot(times, temps, 'b-', linewidth=2, label='温度曲线')
-
-        # 处理关键节点
-        key_indices = list(set(key_points))
-        key_indices.sort()
-        used_positions = []
-
-        # 为每个关键节点添加标记和标注
-        for idx in key_indices:
-            time = times[idx]
-            temp = temps[idx]
-            desc = descriptions[idx]
-
-            # 绘制关键节点标记
-            plt.scatter(time, temp, color='red', s=80, marker='d', zorder=5)
-
-            # 绘制垂直和水平虚线
-            plt.axvline(x=time, color='gray', linestyle='--', linewidth=1, alpha=0.7)
-            plt.axhline(y=temp, color='gray', linestyle='--', linewidth=1, alpha=0.7)
-
-            # 动态计算x轴标注位置（小时单位）
-            x_pos = time
-            y_text_pos = plt.ylim()[0] + (plt.ylim()[1] - plt.ylim()[0]) * 0.02
-            label_offset = 0.03 * (plt.xlim()[1] - plt.xlim()[0])
-
-            # 检查重叠
-            overlap = any(abs(x_pos - used_x) < label_offset for (used_x, _) in used_positions)
-            if overlap:
-                y_text_pos = plt.ylim()[0] + (plt.ylim()[1] - plt.ylim()[0]) * 0.06
-            else:
-                used_positions.append((x_pos, y_text_pos))
-
-            # x轴时间标注（显示小时）
-            plt.text(x_pos, y_text_pos, f'{time:.2f}h',
-                     horizontalalignment='center',
-                     verticalalignment='bottom',
-                     color='darkred',
-                     bbox=dict(facecolor='white', alpha=0.9, boxstyle='round,pad=0.2'))
-
-            # 动态计算y轴标注位置
-            y_pos = temp
-            x_text_pos = plt.xlim()[0] + (plt.xlim()[1] - plt.xlim()[0]) * 0.02
-
-            # 检查y轴标注重叠
-            y_overlap = any(
-                abs(y_pos - used_y) < 0.03 * (plt.ylim()[1] - plt.ylim()[0]) for (_, used_y) in used_positions)
-            if y_overlap:
-                x_text_pos = plt.xlim()[0] + (plt.xlim()[1] - plt.xlim()[0]) * 0.06
-            else:
-                used_positions.append((x_text_pos, y_pos))
-
-            # y轴温度标注
-            plt.text(x_text_pos, y_pos, f'{temp:.1f}℃',
-                     horizontalalignment='left',
-                     verticalalignment='center',
-                     color='darkgreen',
-                     bbox=dict(facecolor='white', alpha=0.9, boxstyle='round,pad=0.2'))
-
-            # 动态调整说明文字位置
-            chart_center_x = (plt.xlim()[0] + plt.xlim()[1]) / 2
-            chart_center_y = (plt.ylim()[0] + plt.ylim()[1]) / 2
-
-            if time > chart_center_x and temp > chart_center_y:
-                text_x, text_y = -10, -10
-            elif time < chart_center_x and temp > chart_center_y:
-                text_x, text_y = 10, -10
-            elif time > chart_center_x and temp < chart_center_y:
-                text_x, text_y = -10, 10
-            else:
-                text_x, text_y = 10, 10
+        fig = Figure(figsize=(14, 9))
+        ax = fig.subplots()
 
+        # 温度曲线、关键节点及标注
+        draw_temperature_profile(ax, times, temps, key_points, dpi)
 
         # 坐标轴设置（小时单位）
-        plt.xlim(0, max(times) * 1.15)
-        min_temp = min(temps)
-        plt.ylim(min(0, min_temp * 1.15), max(temps) * 1.15)
+        ax.set_xlim(0, times.max() * 1.15)
+        min_temp = temps.min()
+        ax.set_ylim(min(0, min_temp * 1.15), temps.max() * 1.15)
 
-        plt.xlabel('时间 (h)', fontsize=11)  # 改为小时
-        plt.ylabel('温度 (℃)', fontsize=11)
-        plt.title('温度随时间变化曲线', fontsize=13)
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.legend()
+        ax.set_xlabel('时间 (h)', fontsize=11)  # 改为小时
+        ax.set_ylabel('温度 (℃)', fontsize=11)
+        ax.set_title('温度随时间变化曲线', fontsize=13)
+        ax.grid(True, linestyle='--', alpha=0.7)
+        ax.legend()
 
         # 保存图表
         file_path = os.path.join('data/charts', filename)
-        plt.savefig(file_path, dpi=250, bbox_inches='tight')
+        fig.savefig(file_path, dpi=dpi, bbox_inches='tight')
         print(f"图表已保存至: {file_path}")
-
-        plt.close()
         return True
     except Exception as e:
         print(f"图表创建失败: {e}")
@@ -328,17 +130,17 @@ def main():
     if not params:
         return
 
-    profile, key_points = calculate_temperature_profile(params)
-    if not profile or not key_points:
+    times, temps, descs, key_points = calculate_temperature_profile(params)
+    if times is None:
         return
 
     filename_input = input("请输入文件名（无需扩展名）: ")
     cleaned_filename = validate_filename(filename_input)
 
-    if not create_excel_file(params, profile, f"{cleaned_filename}.xlsx"):
+    if not create_excel_file(params, times, temps, descs, f"{cleaned_filename}.xlsx"):
         return
 
-    if not create_chart_png(profile, key_points, f"{cleaned_filename}.png"):
+    if not create_chart_png(times, temps, key_points, f"{cleaned_filename}.png"):
         return
 
     print("操作完成！")
@@ -0,0 +1,227 @@
+"""温度曲线的计算、Excel组装与图表绘制，命令行版（MAIN01.py）与网页版（web.py）共用"""
+import bisect
+import re
+
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+# 文件名中不允许出现的字符
+_INVALID_FN = re.compile(r'[\\/*?:"<>|]')
+
+# 表头字体只创建一次，所有表头单元格共用
+_BOLD = Font(bold=True)
+
+# 参数表模板：(参数名称, params中的键, 显示单位, 换算除数)
+# 速率内部为℃/h，显示时除以60转换回℃/min
+PARAM_TEMPLATE = (
+    ("初始温度", 'initial_temp', "℃", 1),
+    ("初始温度持续时间", 'initial_time', "h", 1),
+    ("回温温度", 'recovery_temp', "℃", 1),
+    ("回温温度持续时间", 'recovery_time', "h", 1),
+    ("高温温度", 'high_temp', "℃", 1),
+    ("高温允差", 'high_tolerance', "℃", 1),
+    ("低温温度", 'low_temp', "℃", 1),
+    ("低温允差", 'low_tolerance', "℃", 1),
+    ("首循环高温保持时间", 'first_high_time', "h", 1),
+    ("首循环低温保持时间", 'first_low_time', "h", 1),
+    ("末循环高温保持时间", 'last_high_time', "h", 1),
+    ("末循环低温保持时间", 'last_low_time', "h", 1),
+    ("中间循环高温保持时间", 'middle_high_time', "h", 1),
+    ("中间循环低温保持时间", 'middle_low_time', "h", 1),
+    ("升温速率", 'heat_rate', "℃/min", 60),
+    ("降温速率", 'cool_rate', "℃/min", 60),
+    ("循环次数", 'cycles', "次", 1),
+)
+
+
+def validate_filename(filename):
+    """验证并清理文件名"""
+    return (_INVALID_FN.sub('', filename) or "temp_profile")[:50]
+
+
+# ==================== 温度曲线计算 ====================
+# 只做几次整体数组运算，耗时随节点数（约4*cycles）线性增长，cycles很大时也无需逐节点编译
+def _accumulate_profile(temps, durations, ramps, heat_rate, cool_rate):
+    """计算各候选节点的累计时间（NumPy向量化），并标记需要保留的节点"""
+    # 升降温节点耗时 = 温差 / 速率（已转换为℃/h），温差为0的升降温节点不记录
+    temp_diffs = np.diff(temps, prepend=temps[0])
+    keep = ~ramps | (temp_diffs != 0)
+    ramps = ramps & keep
+    rates = np.where(temp_diffs[ramps] > 0, heat_rate, cool_rate)
+    durations = durations.copy()
+    with np.errstate(divide='raise'):
+        durations[ramps] = np.abs(temp_diffs[ramps]) / rates
+    return np.cumsum(durations), keep
+
+
+def build_temperature_profile(params):
+    """计算温度曲线数据（时间单位：小时），返回times, temps, descs, key_points；参数有误时抛出异常"""
+    cycles = params['cycles']
+
+    # 各循环的保持时间与名称（首循环优先于末循环）
+    high_times = np.full(cycles, params['middle_high_time'], dtype=float)
+    low_times = np.full(cycles, params['middle_low_time'], dtype=float)
+    cycle_types = [f"中间循环{cycle}" for cycle in range(cycles)]
+    if cycles > 0:
+        high_times[-1], low_times[-1], cycle_types[-1] = params['last_high_time'], params['last_low_time'], "末循环"
+        high_times[0], low_times[0], cycle_types[0] = params['first_high_time'], params['first_low_time'], "首循环"
+
+    # 每轮循环4个节点：升温到高温、高温结束、降温到低温、低温结束；末循环不降温
+    n_cycle_points = max(4 * cycles - 2, 0)
+    zeros = np.zeros(cycles)
+    cycle_temps = np.tile([params['high_temp'], params['high_temp'], params['low_temp'], params['low_temp']], cycles)
+    cycle_holds = np.column_stack((zeros, high_times, zeros, low_times)).ravel()
+    cycle_ramps = np.tile([True, False, True, False], cycles)
+    cycle_descs = [f"{cycle_type}{stage}" for cycle_type in cycle_types
+                   for stage in ("高温达到", "高温结束", "低温达到", "低温结束")]
+
+    # 1. 初始温度阶段  2. 循环过程  3. 回温阶段（按节点顺序拼接）
+    temps = np.concatenate(([params['initial_temp']] * 2, cycle_temps[:n_cycle_points],
+                            [params['recovery_temp']] * 2))
+    durations = np.concatenate(([0.0, params['initial_time']], cycle_holds[:n_cycle_points],
+                                [0.0, params['recovery_time']]))
+    ramps = np.concatenate(([False, False], cycle_ramps[:n_cycle_points], [True, False]))
+    descs = np.array(["初始温度开始", "初始温度结束"] + cycle_descs[:n_cycle_points]
+                     + ["回温温度达到", "回温结束"], dtype=object)
+
+    # 累计各节点时间（温差为0的升降温节点不记录）
+    times, keep = _accumulate_profile(temps, durations, ramps, params['heat_rate'], params['cool_rate'])
+
+    times, temps, descs = times[keep], temps[keep], descs[keep].tolist()
+    # 每个节点都是关键节点
+    key_points = np.arange(len(times))
+
+    return times, temps, descs, key_points
+
+
+# ==================== Excel组装 ====================
+def _header_row(ws, titles):
+    """生成加粗的表头行（write-only模式下需用WriteOnlyCell设置样式）"""
+    cells = []
+    for title in titles:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font = _BOLD
+        cells.append(cell)
+    return cells
+
+
+def _write_sheet(wb, title, header, rows):
+    """新建工作表，一次性写入表头和预先组装好的二维数据行"""
+    ws = wb.create_sheet(title)
+    ws.append(_header_row(ws, header))
+    for row in rows:
+        ws.append(row)
+    return ws
+
+
+def build_workbook(params, times, temps, descs):
+    """组装参数表和数据表（时间显示为小时，速率显示为℃/min），返回尚未保存的Workbook"""
+    # 参数表
+    param_list = [(name, params[key] / divisor if divisor != 1 else params[key], unit)
+                  for name, key, unit, divisor in PARAM_TEMPLATE]
+
+    params_rows = [[name, round(value, 2) if isinstance(value, float) else value, unit]
+                   for name, value, unit in param_list]
+
+    # 数据表
+    data_rows = list(zip(np.round(times, 2).tolist(), np.round(temps, 2).tolist(), descs))
+
+    wb = Workbook(write_only=True)
+    _write_sheet(wb, "输入参数", ("参数名称", "数值", "单位"), params_rows)
+    _write_sheet(wb, "温度随时间变化", ("时间 (h)", "温度 (℃)", "说明"), data_rows)
+    return wb
+
+
+# ==================== 图表绘制 ====================
+def _minmax_downsample(times, temps, n_bins):
+    """MinMax降采样：按索引分成n_bins段，每段只保留温度最低和最高的点（保留首尾点）"""
+    edges = np.linspace(0, len(times), n_bins + 1).astype(int)
+    keep = [0, len(times) - 1]
+    for lo, hi in zip(edges[:-1].tolist(), edges[1:].tolist()):
+        if hi > lo:
+            segment = temps[lo:hi]
+            keep += [lo + int(segment.argmin()), lo + int(segment.argmax())]
+    keep = np.unique(keep)
+    return times[keep], temps[keep]
+
+
+def _has_neighbor(sorted_values, value, tol):
+    """判断有序列表中是否存在与value距离小于tol的值（二分查找，只需比较两侧相邻值）"""
+    i = bisect.bisect_left(sorted_values, value)
+    return ((i < len(sorted_values) and sorted_values[i] - value < tol)
+            or (i > 0 and value - sorted_values[i - 1] < tol))
+
+
+def draw_temperature_profile(ax, times, temps, key_points, dpi):
+    """在ax上绘制温度曲线、关键节点标记及时间/温度标注（dpi为最高输出分辨率，用于判断是否需要降采样）"""
+    # 节点数远超画布像素宽度时先降采样曲线，关键节点标记仍使用原始数据
+    canvas_px = int(ax.figure.get_figwidth() * dpi)
+    line_times, line_temps = times, temps
+    if len(times) > 4 * canvas_px:
+        line_times, line_temps = _minmax_downsample(times, temps, canvas_px)
+
+    # 绘制温度曲线
+    ax.plot(line_times, line_temps, 'b-', linewidth=2, label='温度曲线')
+
+    # 处理关键节点（按生成顺序排列，本身有序且不重复，无需去重排序）
+    # 已放置标注的x、y坐标（各自有序，便于二分查找重叠）
+    used_x, used_y = [], []
+
+    # 批量绘制关键节点标记及垂直、水平虚线（虚线贯穿整个坐标区）
+    key_times, key_temps = times[key_points], temps[key_points]
+    ax.scatter(key_times, key_temps, color='red', s=80, marker='d', zorder=5)
+    ax.vlines(key_times, 0, 1, transform=ax.get_xaxis_transform(),
+              colors='gray', linestyles='--', linewidth=1, alpha=0.7, zorder=2)
+    ax.hlines(key_temps, 0, 1, transform=ax.get_yaxis_transform(),
+              colors='gray', linestyles='--', linewidth=1, alpha=0.7, zorder=2)
+
+    # 坐标范围在标注过程中不变，循环前只查询一次
+    xmin, xmax = ax.get_xlim()
+    ymin, ymax = ax.get_ylim()
+    xspan, yspan = xmax - xmin, ymax - ymin
+    label_offset = 0.03 * xspan
+    y_base, y_alt = ymin + yspan * 0.02, ymin + yspan * 0.06
+    x_base, x_alt = xmin + xspan * 0.02, xmin + xspan * 0.06
+    y_label_offset = 0.03 * yspan
+
+    # 为每个关键节点添加标注（避免重叠）
+    for time, temp in zip(key_times.tolist(), key_temps.tolist()):
+        # 动态计算x轴标注位置（小时单位）
+        x_pos = time
+        y_text_pos = y_base
+
+        # 检查重叠
+        overlap = _has_neighbor(used_x, x_pos, label_offset)
+        if overlap:
+            y_text_pos = y_alt
+        else:
+            bisect.insort(used_x, x_pos)
+            bisect.insort(used_y, y_text_pos)
+
+        # x轴时间标注（显示小时）
+        ax.text(x_pos, y_text_pos, f'{time:.2f}h',
+                horizontalalignment='center',
+                verticalalignment='bottom',
+                color='darkred',
+                bbox=dict(facecolor='white', alpha=0.9, boxstyle='round,pad=0.2'))
+
+        # 动态计算y轴标注位置
+        y_pos = temp
+        x_text_pos = x_base
+
+        # 检查y轴标注重叠
+        y_overlap = _has_neighbor(used_y, y_pos, y_label_offset)
+        if y_overlap:
+            x_text_pos = x_alt
+        else:
+            bisect.insort(used_x, x_text_pos)
+            bisect.insort(used_y, y_pos)
+
+        # y轴温度标注
+        ax.text(x_text_pos, y_pos, f'{temp:.1f}℃',
+                horizontalalignment='left',
+                verticalalignment='center',
+                color='darkgreen',
+                bbox=dict(facecolor='white', alpha=0.9, boxstyle='round,pad=0.2'))